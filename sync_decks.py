@@ -2,12 +2,47 @@ import requests
 import os
 import sys
 import re
+import csv
+import gzip
+import io
+import json
+import logging
 import unicodedata
 import time
 import random
-from typing import List, Dict, Optional
-from datetime import datetime
+import sqlite3
+import threading
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Dict, Optional, Set, Tuple, Union
 from urllib.parse import quote_plus
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Optional: orjson is much faster than stdlib json for bulk payloads
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Optional: direct Postgres COPY path for bulk inserts (see SUPABASE_DB_URL)
+try:
+    import psycopg
+    from psycopg import sql
+
+    # COPY errors that the next flush would only hit again (wrong object
+    # type, missing table/column/constraint, permissions)
+    _COPY_PERMANENT_ERRORS = (
+        psycopg.errors.WrongObjectType,
+        psycopg.errors.FeatureNotSupported,
+        psycopg.errors.UndefinedTable,
+        psycopg.errors.UndefinedColumn,
+        psycopg.errors.InvalidColumnReference,
+        psycopg.errors.InsufficientPrivilege,
+    )
+except ImportError:
+    psycopg = None
 
 # ==========================
 # Configuration from environment variables (NO HARDCODED SECRETS!)
@@ -26,22 +61,130 @@ DECK_CACHE_TABLE = "deck_cache_view"
 
 # NOTE: On GitHub Actions you are more likely to be throttled by MTGGoldfish.
 # Use jitter-based delays for MTGGoldfish and keep Supabase delay minimal.
-RATE_LIMIT_DELAY = float(os.environ.get("RATE_LIMIT_DELAY", "0.0"))
+# Every MTGGoldfish HTTP request (retries included) also takes a token from a
+# bucket refilled at MTGGOLDFISH_MAX_RPS; 0 disables the bucket.
+MTGGOLDFISH_MAX_RPS = float(os.environ.get("MTGGOLDFISH_MAX_RPS", "1.0"))
+MTGGOLDFISH_BURST = float(os.environ.get("MTGGOLDFISH_BURST", "2"))
 
 # 0 means "no limit" (process everything)
 MAX_DECKS_PER_RUN = int(os.environ.get("MAX_DECKS_PER_RUN", "0"))
 
 # When processing "all", we still do it in batches for safety
-BATCH_FETCH_LIMIT = int(os.environ.get("BATCH_FETCH_LIMIT", "200"))
+BATCH_FETCH_LIMIT = max(1, int(os.environ.get("BATCH_FETCH_LIMIT", "200")))
+
+# Missing IDs requested per get_missing_deck_ids call; the slice is then
+# processed locally in BATCH_FETCH_LIMIT batches, so the RPC's anti-join is
+# not re-run for every batch. Supabase caps responses at its max-rows setting
+# (1000 by default), so larger values do not return more.
+MISSING_IDS_FETCH_LIMIT = max(1, int(os.environ.get("MISSING_IDS_FETCH_LIMIT", "1000")))
+
+# Load every deck_id already in the cache table once at startup and skip
+# those locally (guards against a stale/imprecise missing-IDs source).
+# Off by default: it pages through the whole cache table.
+PRELOAD_CACHED_IDS = os.environ.get("PRELOAD_CACHED_IDS", "0") == "1"
+
+# Optional direct Postgres connection string (e.g. the Supabase pooler URL).
+# When set (and psycopg is installed), bulk inserts use COPY over the wire
+# protocol instead of PostgREST; PostgREST stays the fallback.
+SUPABASE_DB_URL = os.environ.get("SUPABASE_DB_URL", "")
+
+# Decks per bulk insert into the cache table (one PostgREST request each)
+SUPABASE_INSERT_BATCH = max(1, int(os.environ.get("SUPABASE_INSERT_BATCH", "50")))
+
+# ...or sooner, once the oldest buffered deck has waited this many seconds.
+# Fetches are paced, so a full batch can take minutes to fill.
+SUPABASE_FLUSH_INTERVAL = float(os.environ.get("SUPABASE_FLUSH_INTERVAL", "60"))
 
 # MTGGoldfish throttle/backoff tuning (recommended for GitHub Actions)
 MTGGOLDFISH_DELAY_MIN = float(os.environ.get("MTGGOLDFISH_DELAY_MIN", "3.0"))
 MTGGOLDFISH_DELAY_MAX = float(os.environ.get("MTGGOLDFISH_DELAY_MAX", "7.0"))
+# The per-deck delay starts around MIN..MAX and adapts: it shrinks while
+# MTGGoldfish answers normally (never below this floor, in seconds) and
+# doubles on every throttle response (up to MTGGOLDFISH_DELAY_CEILING).
+MTGGOLDFISH_DELAY_FLOOR = float(os.environ.get("MTGGOLDFISH_DELAY_FLOOR", "1.0"))
+MTGGOLDFISH_DELAY_CEILING = float(os.environ.get("MTGGOLDFISH_DELAY_CEILING", "60.0"))
 MTGGOLDFISH_MAX_RETRIES = int(os.environ.get("MTGGOLDFISH_MAX_RETRIES", "7"))
 MTGGOLDFISH_TIMEOUT = int(os.environ.get("MTGGOLDFISH_TIMEOUT", "25"))
 
-# Shared session (keep-alive + cookies)
-SESSION = requests.Session()
+# The fallback deck endpoint is only requested once the primary has failed
+# or has taken longer than this many seconds (e.g. while backing off)
+MTGGOLDFISH_HEDGE_DELAY = float(os.environ.get("MTGGOLDFISH_HEDGE_DELAY", "10"))
+
+# Decks processed in parallel. MTGGoldfish cadence is still governed by the
+# shared adaptive pacer, so this mainly overlaps network latency and saves.
+DECK_CONCURRENCY = int(os.environ.get("DECK_CONCURRENCY", "4"))
+
+# Local sqlite cache of fetched deck text, so reruns skip MTGGoldfish.
+# Set DECK_TEXT_CACHE_PATH="" to disable; TTL in seconds, 0 = never expire.
+DECK_TEXT_CACHE_PATH = os.environ.get("DECK_TEXT_CACHE_PATH", ".deck_cache.sqlite")
+DECK_TEXT_CACHE_TTL = float(os.environ.get("DECK_TEXT_CACHE_TTL", str(7 * 24 * 3600)))
+# Expired entries are kept for conditional revalidation, but only up to this
+# age; entries are also dropped as soon as the deck is saved to Supabase.
+DECK_TEXT_CACHE_MAX_AGE = float(os.environ.get("DECK_TEXT_CACHE_MAX_AGE", str(4 * DECK_TEXT_CACHE_TTL)))
+
+# The same sqlite file remembers which deck IDs were saved to Supabase, so
+# IDs the RPC returns again (races, partial failures) are skipped for this
+# many seconds. 0 disables.
+SAVED_IDS_TTL = float(os.environ.get("SAVED_IDS_TTL", str(24 * 3600)))
+
+# ...and which ones MTGGoldfish answered with a clean 404/410 on every
+# endpoint (deleted/private decks), so they are not re-fetched on every run
+# until this many seconds have passed. 0 disables.
+DEAD_IDS_TTL = float(os.environ.get("DEAD_IDS_TTL", str(7 * 24 * 3600)))
+_NOT_FOUND_STATUSES = (404, 410)
+# Returned instead of text/row when every endpoint reported the deck as not found
+DECK_NOT_FOUND = object()
+
+# Deck downloads are plain text; "<html" near the start means an error/challenge page
+_HTML_RE = re.compile(rb"<html|<!doctype html", re.IGNORECASE)
+HTML_SNIFF_BYTES = 2048
+
+# Gzip Supabase request bodies at least this large (0 = never). Off by default:
+# only enable it if your Supabase/PostgREST gateway accepts Content-Encoding: gzip.
+# Responses are already compressed: requests sends Accept-Encoding for every
+# coding it can decode.
+SUPABASE_GZIP_MIN_BYTES = int(os.environ.get("SUPABASE_GZIP_MIN_BYTES", "0"))
+
+# DEBUG=1 logs the full traceback on a fatal error (one line otherwise)
+DEBUG = os.environ.get("DEBUG", "0") not in ("", "0")
+
+# "<count> <card name>" decklist line
+_DECK_LINE_RE = re.compile(r"^(\d+)\s+(.+)$")
+
+# Connection pool sizing shared by both sessions (keep >= DECK_CONCURRENCY)
+HTTP_POOL_CONNECTIONS = 16
+HTTP_POOL_MAXSIZE = max(32, DECK_CONCURRENCY * 2)
+
+
+# Transient Supabase errors (429/5xx) are retried inside the adapter with
+# exponential backoff, honoring Retry-After. Both Supabase POSTs are safe to
+# repeat: the RPC is read-only and inserts skip decks that already exist.
+# MTGGoldfish keeps its own throttle-aware loop in _get_with_backoff.
+SUPABASE_RETRY = Retry(
+    total=5,
+    backoff_factor=0.5,
+    status_forcelist=[429, 500, 502, 503, 504],
+    allowed_methods=["GET", "POST"],
+    respect_retry_after_header=True,
+    raise_on_status=False,
+)
+
+
+def _mount_pool(session: requests.Session, max_retries=0) -> requests.Session:
+    # One adapter for both schemes, so a plain-http SUPABASE_URL (local
+    # Supabase) gets the same pool size and retries as https
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        max_retries=max_retries,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Shared MTGGoldfish session (keep-alive + cookies)
+SESSION = _mount_pool(requests.Session())
 SESSION.headers.update({
     "User-Agent": os.environ.get(
         "USER_AGENT",
@@ -53,72 +196,239 @@ SESSION.headers.update({
     "Connection": "keep-alive",
 })
 
+# Separate Supabase session so the service role key is never sent to MTGGoldfish
+SUPABASE_SESSION = _mount_pool(requests.Session(), max_retries=SUPABASE_RETRY)
+SUPABASE_SESSION.headers.update({
+    "apikey": SUPABASE_SERVICE_ROLE,
+    "Authorization": f"Bearer {SUPABASE_SERVICE_ROLE}",
+    "Content-Type": "application/json",
+    "Accept": "application/json;q=0.9,*/*;q=0.8",
+    "User-Agent": "pauper-decklist-cron (sync_decks.py)",
+})
+
+# Supabase endpoints and per-call extra headers, built once at import time
+SUPABASE_RPC_URL = f"{SUPABASE_URL}/rest/v1/rpc/get_missing_deck_ids"
+SUPABASE_INSERT_URL = f"{SUPABASE_URL}/rest/v1/{DECK_CACHE_TABLE}"
+SUPABASE_UPSERT_URL = f"{SUPABASE_INSERT_URL}?on_conflict=deck_id"
+SUPABASE_HEADERS_CSV = {"Accept": "text/csv"}
+# INSERT ... ON CONFLICT (deck_id) DO NOTHING: an already cached deck is kept as-is
+SUPABASE_HEADERS_UPSERT = {"Prefer": "resolution=ignore-duplicates,return=minimal"}
+
+# MTGGoldfish deck downloads (in preference order) and Scryfall image URL prefixes
+MTGGOLDFISH_DOWNLOAD_BASES = (
+    "https://www.mtggoldfish.com/deck/download/",
+    "https://www.mtggoldfish.com/deck/arena_download/",
+)
+SCRYFALL_IMAGE_BASE = "https://api.scryfall.com/cards/named?format=image&version="
+SCRYFALL_NORMAL_IMAGE_BASE = f"{SCRYFALL_IMAGE_BASE}normal&fuzzy="
+
 
 # ------------------------------
-# Logging helper
+# Logging
 # ------------------------------
-def log(message: str, level: str = "INFO"):
-    """Log with timestamp and level."""
-    timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-    print(f"[{timestamp}] [{level}] {message}")
-    sys.stdout.flush()
+class _CachedUTCFormatter(logging.Formatter):
+    """
+    Formatter with UTC timestamps at second resolution. The timestamp string
+    is only re-rendered when the second changes, not for every record.
+    """
+
+    def __init__(self, fmt: str, datefmt: str):
+        super().__init__(fmt, datefmt)
+        self._cached_ts = (-1, "")
+
+    def formatTime(self, record: logging.LogRecord, datefmt: Optional[str] = None) -> str:
+        second = int(record.created)
+        cached_second, text = self._cached_ts
+        if second != cached_second:
+            text = time.strftime(datefmt or self.datefmt, time.gmtime(second))
+            self._cached_ts = (second, text)
+        return text
+
+
+_log_handler = logging.StreamHandler(sys.stdout)
+_log_handler.setFormatter(_CachedUTCFormatter("[%(asctime)s] [%(levelname)s] %(message)s", "%Y-%m-%d %H:%M:%S"))
+logging.basicConfig(level=logging.INFO, handlers=[_log_handler])
+logger = logging.getLogger("sync_decks")
 
 
 # ------------------------------
-# Sleep helpers (jitter)
+# Rate limiting (adaptive jitter pacer + token bucket)
 # ------------------------------
-def sleep_jitter(min_s: float, max_s: float):
-    time.sleep(random.uniform(min_s, max_s))
+class AdaptivePacer:
+    """
+    Thread-safe per-deck pacer. Slots are spaced by a jittered interval shared
+    by all worker threads, so parallel decks keep the cadence of a serial run.
+    The interval adapts AIMD-style: it shrinks by 10% after every normal
+    response (probing for the real safe rate) and doubles on a throttle.
+    """
+
+    def __init__(self, delay_min: float, delay_max: float, floor: float, ceiling: float):
+        mid = (delay_min + delay_max) / 2.0
+        # Jitter keeps the MIN..MAX shape relative to the current interval
+        self._jitter = (delay_min / mid, delay_max / mid) if mid > 0 else (1.0, 1.0)
+        self._floor = min(floor, mid)
+        self._ceiling = max(ceiling, mid)
+        self._interval = mid
+        self._next_slot_at = 0.0
+        self._last_backoff_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Block until the next MTGGoldfish fetch slot."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot_at)
+            self._next_slot_at = slot + self._interval * random.uniform(*self._jitter)
+        time.sleep(slot - now)
+
+    def on_success(self):
+        with self._lock:
+            self._interval = max(self._floor, self._interval * 0.9)
+
+    def on_throttle(self):
+        with self._lock:
+            now = time.monotonic()
+            # Parallel requests hitting the same throttle count as one signal
+            if now - self._last_backoff_at < self._interval:
+                return
+            self._last_backoff_at = now
+            self._interval = min(self._ceiling, self._interval * 2.0)
+            logger.info("MTGGoldfish pacing slowed to ~%.1fs per deck", self._interval)
+
+    def backed_off_recently(self) -> bool:
+        """True if a throttle slowed the pacer down within the current interval."""
+        with self._lock:
+            return time.monotonic() - self._last_backoff_at < self._interval
+
+
+MTGGOLDFISH_PACER = AdaptivePacer(
+    MTGGOLDFISH_DELAY_MIN, MTGGOLDFISH_DELAY_MAX, MTGGOLDFISH_DELAY_FLOOR, MTGGOLDFISH_DELAY_CEILING
+)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` requests per second on average, with
+    bursts up to `capacity`. Unlike a fixed sleep, fast responses are not
+    padded out; callers only wait when they are actually over the rate.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now >= self._paused_until and self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = max(self._paused_until - now, (1.0 - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause_until(self, deadline: float):
+        """Hold all acquisitions until `deadline` (time.monotonic() based)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, deadline)
+
+
+MTGGOLDFISH_LIMITER = TokenBucket(MTGGOLDFISH_MAX_RPS, MTGGOLDFISH_BURST)
+
+
+def _apply_rate_limit_headers(resp: requests.Response):
+    """
+    If the server says the quota is used up (X-RateLimit-Remaining: 0),
+    pause the limiter until X-RateLimit-Reset (delta seconds or epoch).
+    """
+    remaining = resp.headers.get("X-RateLimit-Remaining")
+    reset = resp.headers.get("X-RateLimit-Reset")
+    if remaining is None or reset is None:
+        return
+    try:
+        if float(remaining) > 0:
+            return
+        reset_s = float(reset)
+    except ValueError:
+        return
+
+    delay = reset_s - time.time() if reset_s > 1e9 else reset_s
+    if delay > 0:
+        MTGGOLDFISH_LIMITER.pause_until(time.monotonic() + min(delay, 300.0))
 
 
 # ------------------------------
 # Card name normalization
 # ------------------------------
+# Curly apostrophes / quotes → plain, in one pass
+_QUOTES_TABLE = str.maketrans({
+    "\u2019": "'",
+    "\u2018": "'",
+    "\u201C": '"',
+    "\u201D": '"',
+})
+
+
+@lru_cache(maxsize=16384)
 def normalize_card_name(name: str) -> str:
-    """Normalize card name by converting smart quotes to regular quotes."""
+    """
+    Normalize card name by converting smart quotes to regular quotes.
+    Cached: the same staples show up in almost every deck of a run.
+    """
     if not name:
         return ""
 
-    name = unicodedata.normalize("NFKC", name)
-
-    # Curly apostrophes / quotes → plain
-    name = name.replace("\u2019", "'").replace("\u2018", "'")
-    name = name.replace("\u201C", '"').replace("\u201D", '"')
+    # ASCII is already NFKC-stable and has no curly quotes (the common case)
+    if name.isascii():
+        return name.strip()
 
+    name = unicodedata.normalize("NFKC", name).translate(_QUOTES_TABLE)
     return name.strip()
 
 
 # ------------------------------
 # Build Scryfall "named image" URL (no API call needed)
 # ------------------------------
+@lru_cache(maxsize=16384)
 def build_scryfall_fuzzy_image_url(card_name: str, version: str = "normal") -> str:
     """
     Deterministic URL that Scryfall will redirect to the CDN image.
     Works directly in <img src="..."> because browsers follow redirects.
+    Cached per (name, version), so repeated staples skip quote_plus.
     """
     name = normalize_card_name(card_name)
     if not name:
         return ""
-    return f"https://api.scryfall.com/cards/named?format=image&version={version}&fuzzy={quote_plus(name)}"
+    if version == "normal":
+        return SCRYFALL_NORMAL_IMAGE_BASE + quote_plus(name)
+    return f"{SCRYFALL_IMAGE_BASE}{version}&fuzzy={quote_plus(name)}"
 
 
 # ------------------------------
 # Parse decklist into structured format
 # ------------------------------
-def parse_decklist(decklist: str) -> Dict[str, List[Dict[str, any]]]:
+def parse_decklist(decklist: str) -> Dict[str, List[Tuple[str, int]]]:
     """
-    Parse a decklist string into mainboard and sideboard sections.
-    Sections are separated by a blank line.
+    Parse a decklist string into mainboard and sideboard sections of
+    (name, count) tuples. Sections are separated by a blank line.
     """
-    lines = decklist.strip().split("\n")
-
     mainboard = []
     sideboard = []
     current_section = mainboard
     blank_line_encountered = False
 
-    for line in lines:
-        line = line.strip()
+    # Iterate lazily instead of materializing a stripped copy + list of lines;
+    # leading/trailing blank lines are harmless (see the blank-line rule below)
+    for raw_line in io.StringIO(decklist):
+        line = raw_line.strip()
 
         if not line:
             if not blank_line_encountered and mainboard:
@@ -126,16 +436,20 @@ def parse_decklist(decklist: str) -> Dict[str, List[Dict[str, any]]]:
                 current_section = sideboard
             continue
 
-        match = re.match(r"^(\d+)\s+(.+)$", line)
-        if match:
-            count = int(match.group(1))
-            card_name = match.group(2).strip()
+        # `line` is already stripped, so only the gap after the count needs
+        # trimming. Fast path for the usual "4 Lightning Bolt"; regex for the rest.
+        count_str, sep, rest = line.partition(" ")
+        if sep and count_str.isdecimal():
+            count, card_name = int(count_str), rest.lstrip()
         else:
-            count = 1
-            card_name = line.strip()
+            match = _DECK_LINE_RE.match(line)
+            if match:
+                count, card_name = int(match.group(1)), match.group(2)
+            else:
+                count, card_name = 1, line
 
         if card_name:
-            current_section.append({"name": card_name, "count": count})
+            current_section.append((card_name, count))
 
     return {"mainboard": mainboard, "sideboard": sideboard}
 
@@ -148,167 +462,603 @@ def process_decklist_to_json(decklist: str) -> Dict:
     Return formatted JSON with Scryfall image URLs built locally.
     """
     parsed = parse_decklist(decklist)
+    return {
+        "mainboard": _section_to_json(parsed["mainboard"]),
+        "sideboard": _section_to_json(parsed["sideboard"]),
+    }
 
-    result = {"mainboard": [], "sideboard": []}
 
-    for card in parsed["mainboard"]:
-        result["mainboard"].append(
-            {
-                "name": card["name"],
-                "count": card["count"],
-                "scryfall_url": build_scryfall_fuzzy_image_url(card["name"]),
-            }
-        )
+def _section_to_json(cards: List[Tuple[str, int]]) -> List[Dict[str, any]]:
+    return [
+        {
+            "name": name,
+            "count": count,
+            "scryfall_url": build_scryfall_fuzzy_image_url(name),
+        }
+        for name, count in cards
+    ]
 
-    for card in parsed["sideboard"]:
-        result["sideboard"].append(
-            {
-                "name": card["name"],
-                "count": card["count"],
-                "scryfall_url": build_scryfall_fuzzy_image_url(card["name"]),
-            }
-        )
 
-    return result
+# ------------------------------
+# JSON helpers (orjson when available)
+# ------------------------------
+def _dumps(payload) -> bytes:
+    """Serialize to compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":"), allow_nan=False).encode("utf-8")
+
+
+def _loads(resp: requests.Response):
+    """Parse a JSON response body."""
+    if orjson is not None:
+        return orjson.loads(resp.content)
+    return resp.json()
+
+
+# ------------------------------
+# Supabase POST helper
+# ------------------------------
+def _supabase_post_json(url: str, payload, headers: Dict[str, str], timeout: int) -> requests.Response:
+    """
+    POST a JSON payload through SUPABASE_SESSION, serialized by _dumps
+    (orjson when installed) and gzip-compressed when it reaches
+    SUPABASE_GZIP_MIN_BYTES.
+    """
+    body = _dumps(payload)
+    if SUPABASE_GZIP_MIN_BYTES > 0 and len(body) >= SUPABASE_GZIP_MIN_BYTES:
+        body = gzip.compress(body)
+        headers = {**headers, "Content-Encoding": "gzip"}
+    return SUPABASE_SESSION.post(url, data=body, headers=headers, timeout=timeout)
 
 
 # ------------------------------
 # Find missing IDs using RPC
 # ------------------------------
-def get_missing_ids(limit: int) -> List[int]:
+def _parse_missing_ids_csv(text: str) -> List[int]:
     """
-    Use RPC get_missing_deck_ids(max_results integer) to find missing deck IDs.
+    Parse a PostgREST text/csv RPC response. The first row is the header;
+    use the deck_id (or id) column when present, else the first column.
     """
-    url = f"{SUPABASE_URL}/rest/v1/rpc/get_missing_deck_ids"
+    reader = csv.reader(io.StringIO(text))
+    header = next(reader, None) or []
+    col = 0
+    for name in ("deck_id", "id"):
+        if name in header:
+            col = header.index(name)
+            break
+    return [int(row[col]) for row in reader if len(row) > col and row[col]]
 
-    headers = {
-        "apikey": SUPABASE_SERVICE_ROLE,
-        "Authorization": f"Bearer {SUPABASE_SERVICE_ROLE}",
-        "Content-Type": "application/json",
-    }
 
-    payload = {"max_results": limit}
+def get_missing_ids(limit: int, offset: int = 0) -> List[int]:
+    """
+    Use RPC get_missing_deck_ids(max_results integer) to find missing deck IDs.
+    `offset` skips that many leading results (PostgREST applies ?offset= to
+    the function's result, so max_results covers offset + limit).
+    Asks for text/csv first (smaller payload, cheap to parse); falls back to
+    JSON if PostgREST cannot produce CSV for this function.
+    """
+    payload = {"max_results": limit + offset}
+    url = f"{SUPABASE_RPC_URL}?offset={offset}" if offset else SUPABASE_RPC_URL
+
+    logger.info("Fetching up to %s missing deck IDs (offset %s) using RPC get_missing_deck_ids...", limit, offset)
+    r = _supabase_post_json(url, payload, SUPABASE_HEADERS_CSV, timeout=30)
 
-    log(f"Fetching up to {limit} missing deck IDs using RPC get_missing_deck_ids...")
-    r = requests.post(url, json=payload, headers=headers, timeout=30)
+    if r.status_code == 200 and r.headers.get("Content-Type", "").startswith("text/csv"):
+        try:
+            missing_ids = _parse_missing_ids_csv(r.text)
+        except ValueError as e:
+            # e.g. an integer[] result, which CSV renders as one "{123,456}" cell
+            logger.warning("Could not parse CSV RPC response (%s); retrying RPC as JSON", e)
+            r = _supabase_post_json(url, payload, {}, timeout=30)
+        else:
+            logger.info("Found %s missing deck IDs", len(missing_ids))
+            return missing_ids
+    elif r.status_code != 200:
+        logger.warning("CSV response unavailable (%s); retrying RPC as JSON", r.status_code)
+        r = _supabase_post_json(url, payload, {}, timeout=30)
 
     if r.status_code != 200:
-        log(f"RPC call failed with status {r.status_code}: {r.text}", "ERROR")
+        logger.error("RPC call failed with status %s: %s", r.status_code, r.text)
         raise RuntimeError(f"Failed to fetch missing IDs via RPC: {r.text}")
 
-    result = r.json()
-    missing_ids: List[int] = []
+    result = _loads(r)
 
-    # Handle both possible return shapes:
+    # Handle both possible return shapes (probe the first element once):
     # 1) [{"deck_id": 123}, ...]
     # 2) [123, 456, ...]
-    if isinstance(result, list) and result:
-        if isinstance(result[0], dict):
-            for row in result:
-                val = row.get("deck_id") or row.get("id")
-                if val is not None:
-                    missing_ids.append(int(val))
-        else:
-            missing_ids = [int(x) for x in result]
-
-    log(f"Found {len(missing_ids)} missing deck IDs")
+    if not isinstance(result, list) or not result:
+        missing_ids: List[int] = []
+    elif isinstance(result[0], dict):
+        values = (row.get("deck_id") or row.get("id") for row in result)
+        missing_ids = [int(val) for val in values if val is not None]
+    else:
+        missing_ids = [int(x) for x in result]
+
+    logger.info("Found %s missing deck IDs", len(missing_ids))
     return missing_ids
 
 
+# ------------------------------
+# Load deck IDs already in the cache table
+# ------------------------------
+def get_cached_deck_ids(page_size: int = 1000) -> Set[int]:
+    """
+    Page through deck_cache_view?select=deck_id and return every cached ID.
+    Best effort: on an error, returns whatever was loaded so far.
+    """
+    cached: Set[int] = set()
+    offset = 0
+
+    while True:
+        try:
+            r = SUPABASE_SESSION.get(
+                SUPABASE_INSERT_URL,
+                params={"select": "deck_id", "order": "deck_id", "limit": page_size, "offset": offset},
+                timeout=30,
+            )
+            if r.status_code != 200:
+                logger.warning("Could not load cached deck IDs (%s); continuing with %s", r.status_code, len(cached))
+                break
+
+            page = _loads(r)
+            cached.update(int(row["deck_id"]) for row in page if row.get("deck_id") is not None)
+        except (requests.RequestException, ValueError, TypeError, AttributeError) as e:
+            logger.warning("Could not load cached deck IDs (%s); continuing with %s", e, len(cached))
+            break
+
+        if len(page) < page_size:
+            break
+        offset += page_size
+
+    logger.info("Loaded %s cached deck IDs", len(cached))
+    return cached
+
+
 # ----------------------------------------
 # MTGGoldfish throttle detection + backoff
 # ----------------------------------------
-def _looks_like_throttle(resp: requests.Response) -> bool:
+def _read_body_unless_html(resp: requests.Response) -> Optional[bytes]:
+    """
+    Stream the response body, but bail out after the first chunk if it is an
+    HTML page (error/Cloudflare/captcha pages are never a decklist and can be
+    large). Returns None for HTML. Bodies served as text/plain (the normal
+    deck download) are read without sniffing.
+    """
+    if resp.headers.get("Content-Type", "").startswith("text/plain"):
+        return resp.content
+
+    chunks = resp.iter_content(chunk_size=HTML_SNIFF_BYTES)
+    first = next(chunks, b"")
+    if _HTML_RE.search(first):
+        resp.close()
+        return None
+    return first + b"".join(chunks)
+
+
+def _retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse Retry-After, which is either delta seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _looks_like_throttle(resp: requests.Response, body: Optional[bytes]) -> bool:
     if resp.status_code in (429, 403, 503):
         return True
-    body = (resp.text or "").lower()
-    # Cloudflare/captcha pages
-    if "<html" in body and ("cloudflare" in body or "captcha" in body or "attention required" in body):
-        return True
-    # Deck download endpoint returning an HTML page is usually bad
-    if "<html" in body:
-        return True
-    return False
+    # Deck download endpoint returning an HTML page (Cloudflare/captcha or otherwise) is usually bad
+    return body is None
 
 
-def _get_with_backoff(url: str) -> Optional[requests.Response]:
+def _get_with_backoff(
+    url: str,
+    cancelled: Optional[threading.Event] = None,
+    headers: Optional[Dict[str, str]] = None,
+    throttle_seen: Optional[threading.Event] = None,
+) -> Optional[Tuple[requests.Response, bytes]]:
     """
     GET with retries and exponential backoff on throttle-like responses.
     Honors Retry-After header when present.
+    If `cancelled` is set (another endpoint already won), stop retrying.
+    `throttle_seen` is set once any attempt got a throttle response.
+    Returns the 200 (or, for conditional `headers`, 304) response together
+    with its (non-HTML) body. A 404/410 is final: it is returned right away,
+    unread and with an empty body, instead of being retried.
     """
+    cancelled = cancelled or threading.Event()
+
     for attempt in range(1, MTGGOLDFISH_MAX_RETRIES + 1):
+        if cancelled.is_set():
+            return None
         try:
-            resp = SESSION.get(url, timeout=MTGGOLDFISH_TIMEOUT)
-
-            if resp.status_code == 200 and not _looks_like_throttle(resp):
-                return resp
-
-            if _looks_like_throttle(resp):
-                retry_after = resp.headers.get("Retry-After")
-                if retry_after:
-                    wait = float(retry_after)
+            MTGGOLDFISH_LIMITER.acquire()
+            resp = SESSION.get(url, headers=headers, timeout=MTGGOLDFISH_TIMEOUT, stream=True)
+            _apply_rate_limit_headers(resp)
+            if resp.status_code in _NOT_FOUND_STATUSES:
+                resp.close()
+                return resp, b""
+
+            body = _read_body_unless_html(resp)
+            throttled = _looks_like_throttle(resp, body)
+
+            if resp.status_code in (200, 304) and not throttled:
+                MTGGOLDFISH_PACER.on_success()
+                return resp, body
+
+            if throttled:
+                if throttle_seen is not None:
+                    throttle_seen.set()
+                MTGGOLDFISH_PACER.on_throttle()
+                retry_after = _retry_after_seconds(resp.headers.get("Retry-After"))
+                if retry_after is not None:
+                    wait = retry_after
+                    # The server named a time: hold every thread, not just this one
+                    MTGGOLDFISH_LIMITER.pause_until(time.monotonic() + min(wait, 300.0))
                 else:
                     # exponential backoff + jitter (cap at 120s)
                     wait = min(120.0, (2 ** (attempt - 1)) + random.uniform(1.0, 4.0))
 
-                log(
-                    f"MTGGoldfish throttle detected ({resp.status_code}). "
-                    f"Backing off {wait:.1f}s (attempt {attempt}/{MTGGOLDFISH_MAX_RETRIES})",
-                    "WARNING",
+                logger.warning(
+                    "MTGGoldfish throttle detected (%s). Backing off %.1fs (attempt %s/%s)",
+                    resp.status_code, wait, attempt, MTGGOLDFISH_MAX_RETRIES,
                 )
-                time.sleep(wait)
+                cancelled.wait(wait)
                 continue
 
             # Other non-200 errors: small backoff
             wait = min(30.0, attempt * 2.0 + random.uniform(0.5, 2.0))
-            log(
-                f"MTGGoldfish returned {resp.status_code}. Waiting {wait:.1f}s "
-                f"(attempt {attempt}/{MTGGOLDFISH_MAX_RETRIES})",
-                "WARNING",
+            logger.warning(
+                "MTGGoldfish returned %s. Waiting %.1fs (attempt %s/%s)",
+                resp.status_code, wait, attempt, MTGGOLDFISH_MAX_RETRIES,
             )
-            time.sleep(wait)
+            cancelled.wait(wait)
 
-        except (requests.Timeout, requests.ConnectionError) as e:
+        except (requests.Timeout, requests.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
             wait = min(120.0, (2 ** (attempt - 1)) + random.uniform(1.0, 4.0))
-            log(
-                f"Network issue fetching MTGGoldfish: {e}. Waiting {wait:.1f}s "
-                f"(attempt {attempt}/{MTGGOLDFISH_MAX_RETRIES})",
-                "WARNING",
+            logger.warning(
+                "Network issue fetching MTGGoldfish: %s. Waiting %.1fs (attempt %s/%s)",
+                e, wait, attempt, MTGGOLDFISH_MAX_RETRIES,
             )
-            time.sleep(wait)
+            cancelled.wait(wait)
 
     return None
 
 
+# ----------------------------------------
+# On-disk deck text cache (sqlite)
+# ----------------------------------------
+_DECK_CACHE_LOCK = threading.Lock()
+_deck_cache_conn: Optional[sqlite3.Connection] = None
+
+
+def _deck_cache() -> Optional[sqlite3.Connection]:
+    """Open the cache database on first use (caller holds _DECK_CACHE_LOCK)."""
+    global _deck_cache_conn
+    if _deck_cache_conn is None and DECK_TEXT_CACHE_PATH:
+        conn = sqlite3.connect(DECK_TEXT_CACHE_PATH, check_same_thread=False)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS deck_text ("
+            "deck_id INTEGER PRIMARY KEY, text TEXT NOT NULL, fetched_at REAL NOT NULL, "
+            "source_url TEXT, etag TEXT, last_modified TEXT)"
+        )
+        # Caches written before conditional revalidation lack the validator columns
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(deck_text)")}
+        for column in ("source_url", "etag", "last_modified"):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE deck_text ADD COLUMN {column} TEXT")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS saved_ids ("
+            "deck_id INTEGER PRIMARY KEY, saved_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS dead_ids ("
+            "deck_id INTEGER PRIMARY KEY, marked_at REAL NOT NULL)"
+        )
+        conn.commit()
+        _prune_deck_cache(conn)
+        _deck_cache_conn = conn
+    return _deck_cache_conn
+
+
+def _prune_deck_cache(conn: sqlite3.Connection):
+    """
+    Drop rows past their TTL so the cache carried between workflow runs
+    does not grow with the league's whole history. VACUUMs once a quarter
+    of the file is free pages.
+    """
+    now = time.time()
+    try:
+        # A disabled (0) TTL means the table is unused, so everything goes
+        conn.execute("DELETE FROM saved_ids WHERE saved_at < ?", (now - max(0.0, SAVED_IDS_TTL),))
+        conn.execute("DELETE FROM dead_ids WHERE marked_at < ?", (now - max(0.0, DEAD_IDS_TTL),))
+        if DECK_TEXT_CACHE_TTL > 0 and DECK_TEXT_CACHE_MAX_AGE > 0:
+            conn.execute("DELETE FROM deck_text WHERE fetched_at < ?", (now - DECK_TEXT_CACHE_MAX_AGE,))
+        conn.commit()
+
+        (page_count,) = conn.execute("PRAGMA page_count").fetchone()
+        (free_pages,) = conn.execute("PRAGMA freelist_count").fetchone()
+        if page_count and free_pages * 4 >= page_count:
+            conn.execute("VACUUM")
+    except sqlite3.Error as e:
+        logger.warning("Deck cache pruning failed: %s", e)
+
+
+def get_cached_deck_text(deck_id: int) -> Optional[Tuple[str, bool, Optional[str], Dict[str, str]]]:
+    """
+    Return (text, fresh, source_url, validators) for a cached deck, or None.
+    `fresh` is False once the entry is older than DECK_TEXT_CACHE_TTL; stale
+    entries with validators can still be revalidated with a conditional GET.
+    """
+    try:
+        with _DECK_CACHE_LOCK:
+            conn = _deck_cache()
+            if conn is None:
+                return None
+            row = conn.execute(
+                "SELECT text, fetched_at, source_url, etag, last_modified FROM deck_text WHERE deck_id = ?",
+                (int(deck_id),),
+            ).fetchone()
+    except sqlite3.Error as e:
+        logger.warning("Deck cache read failed for %s: %s", deck_id, e)
+        return None
+
+    if not row:
+        return None
+    text, fetched_at, source_url, etag, last_modified = row
+    fresh = DECK_TEXT_CACHE_TTL <= 0 or time.time() - fetched_at <= DECK_TEXT_CACHE_TTL
+
+    validators = {}
+    if etag:
+        validators["If-None-Match"] = etag
+    if last_modified:
+        validators["If-Modified-Since"] = last_modified
+    return text, fresh, source_url, validators
+
+
+def put_cached_deck_text(
+    deck_id: int,
+    text: str,
+    source_url: Optional[str] = None,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+):
+    """
+    Store successfully fetched deck text (never HTML or empty bodies), with the
+    endpoint and ETag/Last-Modified it came with so it can be revalidated later.
+    """
+    try:
+        with _DECK_CACHE_LOCK:
+            conn = _deck_cache()
+            if conn is None:
+                return
+            conn.execute(
+                "INSERT OR REPLACE INTO deck_text (deck_id, text, fetched_at, source_url, etag, last_modified) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (int(deck_id), text, time.time(), source_url, etag, last_modified),
+            )
+            conn.commit()
+    except sqlite3.Error as e:
+        logger.warning("Deck cache write failed for %s: %s", deck_id, e)
+
+
+def get_recently_saved_ids() -> Set[int]:
+    """Deck IDs saved to Supabase within the last SAVED_IDS_TTL seconds."""
+    if SAVED_IDS_TTL <= 0:
+        return set()
+    try:
+        with _DECK_CACHE_LOCK:
+            conn = _deck_cache()
+            if conn is None:
+                return set()
+            rows = conn.execute(
+                "SELECT deck_id FROM saved_ids WHERE saved_at >= ?", (time.time() - SAVED_IDS_TTL,)
+            ).fetchall()
+    except sqlite3.Error as e:
+        logger.warning("Saved-ID cache read failed: %s", e)
+        return set()
+    return {deck_id for (deck_id,) in rows}
+
+
+def mark_saved_ids(deck_ids: List[int]):
+    """
+    Remember deck IDs that were just saved to Supabase. Their cached text is
+    dropped: the RPC will not return a saved deck again.
+    """
+    if not deck_ids:
+        return
+    now = time.time()
+    try:
+        with _DECK_CACHE_LOCK:
+            conn = _deck_cache()
+            if conn is None:
+                return
+            if SAVED_IDS_TTL > 0:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO saved_ids (deck_id, saved_at) VALUES (?, ?)",
+                    [(int(deck_id), now) for deck_id in deck_ids],
+                )
+            conn.executemany(
+                "DELETE FROM deck_text WHERE deck_id = ?", [(int(deck_id),) for deck_id in deck_ids]
+            )
+            conn.commit()
+    except sqlite3.Error as e:
+        logger.warning("Saved-ID cache write failed: %s", e)
+
+
+def get_dead_ids() -> Set[int]:
+    """Deck IDs MTGGoldfish reported as not found within the last DEAD_IDS_TTL seconds."""
+    if DEAD_IDS_TTL <= 0:
+        return set()
+    try:
+        with _DECK_CACHE_LOCK:
+            conn = _deck_cache()
+            if conn is None:
+                return set()
+            rows = conn.execute(
+                "SELECT deck_id FROM dead_ids WHERE marked_at >= ?", (time.time() - DEAD_IDS_TTL,)
+            ).fetchall()
+    except sqlite3.Error as e:
+        logger.warning("Dead-ID cache read failed: %s", e)
+        return set()
+    return {deck_id for (deck_id,) in rows}
+
+
+def mark_dead_id(deck_id: int):
+    """Remember a deck ID that every MTGGoldfish endpoint answered with 404/410."""
+    if DEAD_IDS_TTL <= 0:
+        return
+    try:
+        with _DECK_CACHE_LOCK:
+            conn = _deck_cache()
+            if conn is None:
+                return
+            conn.execute(
+                "INSERT OR REPLACE INTO dead_ids (deck_id, marked_at) VALUES (?, ?)",
+                (int(deck_id), time.time()),
+            )
+            conn.commit()
+    except sqlite3.Error as e:
+        logger.warning("Dead-ID cache write failed for %s: %s", deck_id, e)
+
+
 # ----------------------------------------
 # Fetch raw decklist text from MTGGoldfish (with jitter/backoff)
 # ----------------------------------------
-def fetch_deck_text(deck_id: int) -> Optional[str]:
+# Runs the per-endpoint requests of each deck worker (two endpoints per deck)
+_ENDPOINT_POOL = ThreadPoolExecutor(max_workers=max(2, DECK_CONCURRENCY * 2))
+
+
+def _fetch_endpoint_text(
+    url: str, cancelled: threading.Event, throttle_seen: Optional[threading.Event] = None
+) -> Optional[Tuple[requests.Response, str]]:
+    """
+    Fetch one deck download endpoint; return it with its text unless that is
+    empty or HTML. A 404/410 comes back with empty text. `throttle_seen` is
+    set once the endpoint starts backing off from a throttle response.
+    """
+    result = _get_with_backoff(url, cancelled, throttle_seen=throttle_seen)
+    if not result:
+        return None
+
+    resp, body = result
+    if resp.status_code in _NOT_FOUND_STATUSES:
+        return resp, ""
+    text = body.decode("utf-8", "replace").strip()
+    return (resp, text) if text else None
+
+
+def _revalidate_deck_text(
+    deck_id: int, text: str, source_url: str, validators: Dict[str, str]
+) -> Optional[str]:
     """
-    Fetch deck text from MTGGoldfish.
+    Conditional GET for an expired cache entry. 304 keeps the cached text
+    without downloading it again; 200 replaces it. None if the endpoint fails.
+    """
+    result = _get_with_backoff(source_url, headers=validators)
+    if not result:
+        return None
+
+    resp, body = result
+    if resp.status_code == 304:
+        # A 304 may omit validators; keep the stored ones unless it sends new ones
+        put_cached_deck_text(
+            deck_id,
+            text,
+            source_url,
+            resp.headers.get("ETag") or validators.get("If-None-Match"),
+            resp.headers.get("Last-Modified") or validators.get("If-Modified-Since"),
+        )
+        return text
+    if resp.status_code != 200:
+        return None
+
+    new_text = body.decode("utf-8", "replace").strip()
+    if not new_text:
+        return None
+    put_cached_deck_text(deck_id, new_text, source_url, resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+    return new_text
+
+
+def fetch_deck_text(deck_id: int) -> Union[str, object, None]:
+    """
+    Fetch deck text from MTGGoldfish (or the local deck cache).
     On GitHub Actions, throttle is common, so we:
-      - jitter sleep BEFORE each deck fetch
+      - wait for a jittered slot (shared across threads) BEFORE each deck fetch
       - retry with backoff on 429/403/503/HTML pages
       - use a shared session + headers
+    The fallback endpoint is hedged: it is only requested when the primary
+    fails or is slower than MTGGOLDFISH_HEDGE_DELAY without being throttled,
+    so a healthy primary costs one request per deck. The primary still wins
+    whenever it succeeds.
+    Expired cache entries are revalidated with If-None-Match/If-Modified-Since
+    first, so an unchanged deck costs a 304 instead of a full download.
+    Returns DECK_NOT_FOUND (not None) when every endpoint 404s, so callers can
+    tell a deleted deck from a throttled or failed fetch.
     """
-    endpoints = [
-        f"https://www.mtggoldfish.com/deck/download/{deck_id}",
-        f"https://www.mtggoldfish.com/deck/arena_download/{deck_id}",
-    ]
+    cached = get_cached_deck_text(deck_id)
+    if cached:
+        text, fresh, source_url, validators = cached
+        if fresh:
+            return text
 
     # polite jitter before each deck to reduce bot-like cadence
-    sleep_jitter(MTGGOLDFISH_DELAY_MIN, MTGGOLDFISH_DELAY_MAX)
+    MTGGOLDFISH_PACER.wait()
 
-    for url in endpoints:
-        resp = _get_with_backoff(url)
-        if not resp:
-            continue
+    # Expired entry: ask the endpoint it came from whether it changed
+    if cached and source_url and validators:
+        text = _revalidate_deck_text(deck_id, text, source_url, validators)
+        if text:
+            return text
+
+    deck_path = str(deck_id)
+    endpoints = [base + deck_path for base in MTGGOLDFISH_DOWNLOAD_BASES]
 
-        if resp.status_code == 200:
-            text = (resp.text or "").strip()
-            if text and "<html" not in text.lower():
-                return text
+    cancelled = threading.Event()
+    primary_throttled = threading.Event()
+    primary = _ENDPOINT_POOL.submit(_fetch_endpoint_text, endpoints[0], cancelled, primary_throttled)
+    futures = [(endpoints[0], primary)]
 
+    not_found = 0
+    try:
+        wait([primary], timeout=MTGGOLDFISH_HEDGE_DELAY)
+        if not primary.done() and (primary_throttled.is_set() or MTGGOLDFISH_PACER.backed_off_recently()):
+            # Slow because MTGGoldfish is throttling us: a hedged request would
+            # only hit the same throttle, so wait for the primary to finish
+            wait([primary])
+        result = primary.result() if primary.done() else None
+        if not result or result[0].status_code in _NOT_FOUND_STATUSES:
+            futures += [
+                (url, _ENDPOINT_POOL.submit(_fetch_endpoint_text, url, cancelled)) for url in endpoints[1:]
+            ]
+
+        # Resolve in preference order; the loser stops retrying once cancelled
+        for url, future in futures:
+            result = future.result()
+            if not result:
+                continue
+            resp, text = result
+            if resp.status_code in _NOT_FOUND_STATUSES:
+                not_found += 1
+                continue
+            put_cached_deck_text(
+                deck_id, text, url, resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+            )
+            return text
+    finally:
+        cancelled.set()
+
+    # Every endpoint says the deck does not exist: no point asking again next run
+    if not_found == len(endpoints):
+        logger.warning("Deck %s not found on MTGGoldfish; skipping it in future runs", deck_id)
+        mark_dead_id(deck_id)
+        return DECK_NOT_FOUND
     return None
 
 
@@ -317,69 +1067,241 @@ def fetch_deck_text(deck_id: int) -> Optional[str]:
 # --------------------------------------------------------
 def save_deck_to_supabase(deck_id: int, json_decklist: Dict) -> bool:
     """Insert a deck into the cache table with json_decklist only."""
-    url = f"{SUPABASE_URL}/rest/v1/{DECK_CACHE_TABLE}"
-
     payload = {
         "deck_id": int(deck_id),
         "json_decklist": json_decklist,
     }
 
-    headers = {
-        "apikey": SUPABASE_SERVICE_ROLE,
-        "Authorization": f"Bearer {SUPABASE_SERVICE_ROLE}",
-        "Content-Type": "application/json",
-        "Prefer": "return=minimal",
-    }
-
     try:
-        r = requests.post(url, json=payload, headers=headers, timeout=15)
+        r = _supabase_post_json(SUPABASE_UPSERT_URL, payload, SUPABASE_HEADERS_UPSERT, timeout=15)
 
         if r.status_code in (200, 201, 204):
             return True
-        elif r.status_code == 409:
-            log(f"Deck {deck_id} already exists", "WARNING")
-            return True
         else:
-            log(f"Error saving deck {deck_id}: {r.status_code} {r.text}", "ERROR")
+            logger.error("Error saving deck %s: %s %s", deck_id, r.status_code, r.text)
             return False
     except Exception as e:
-        log(f"Exception saving deck {deck_id}: {e}", "ERROR")
+        logger.error("Exception saving deck %s: %s", deck_id, e)
         return False
 
 
+# --------------------------------------------------------
+# Save many decks into deck_cache_view in one request
+# --------------------------------------------------------
+def save_decks_bulk(rows: List[Dict]) -> bool:
+    """
+    Insert a list of {"deck_id", "json_decklist"} rows with a single POST.
+    PostgREST accepts a JSON array body; ignore-duplicates skips decks that
+    are already cached instead of failing the whole batch with a 409.
+    """
+    if not rows:
+        return True
+
+    try:
+        r = _supabase_post_json(SUPABASE_UPSERT_URL, rows, SUPABASE_HEADERS_UPSERT, timeout=30)
+
+        if r.status_code in (200, 201, 204):
+            return True
+        logger.error("Error bulk saving %s decks: %s %s", len(rows), r.status_code, r.text)
+        return False
+    except Exception as e:
+        logger.error("Exception bulk saving %s decks: %s", len(rows), e)
+        return False
+
+
+# --------------------------------------------------------
+# Save many decks with COPY over a direct Postgres connection
+# --------------------------------------------------------
+# One connection for every flush of the run (flushes only happen on the main
+# thread). Dropped after any error and reopened by the next flush; a failed
+# connect or a permanent error (see _COPY_PERMANENT_ERRORS) disables COPY for
+# the rest of the run so PostgREST takes over.
+_copy_conn = None
+_copy_disabled = False
+
+
+def _copy_connection():
+    global _copy_conn
+    if _copy_conn is None or _copy_conn.closed:
+        _copy_conn = psycopg.connect(
+            SUPABASE_DB_URL, connect_timeout=15, prepare_threshold=None, autocommit=True
+        )
+    return _copy_conn
+
+
+def close_copy_connection():
+    global _copy_conn
+    if _copy_conn is not None:
+        _copy_conn.close()
+        _copy_conn = None
+
+
+def save_decks_copy(rows: List[Dict]) -> bool:
+    """
+    COPY rows into a temporary staging table, then move them into the cache
+    table with INSERT ... ON CONFLICT (deck_id) DO NOTHING, all in one
+    transaction. This skips PostgREST's per-request JSON parsing and auth
+    overhead. COPY cannot target deck_cache_view directly (a view), and
+    staging lets duplicates be skipped like on the PostgREST path.
+    Any error rolls back the whole batch and returns False so the caller can
+    fall back to PostgREST.
+    """
+    global _copy_disabled
+    if not rows:
+        return True
+
+    table = sql.Identifier(DECK_CACHE_TABLE)
+    staging = sql.Identifier(f"{DECK_CACHE_TABLE}_staging")
+    # Same column types as the cache table; emptied again at every commit
+    create_stmt = sql.SQL(
+        "CREATE TEMP TABLE IF NOT EXISTS {} ON COMMIT DELETE ROWS AS "
+        "SELECT deck_id, json_decklist FROM {} WITH NO DATA"
+    ).format(staging, table)
+    copy_stmt = sql.SQL("COPY {} (deck_id, json_decklist) FROM STDIN").format(staging)
+    insert_stmt = sql.SQL(
+        "INSERT INTO {} (deck_id, json_decklist) SELECT deck_id, json_decklist FROM {} "
+        "ON CONFLICT (deck_id) DO NOTHING"
+    ).format(table, staging)
+
+    try:
+        conn = _copy_connection()
+    except psycopg.Error as e:
+        logger.error("Could not connect for COPY (%s); using PostgREST for the rest of this run", e)
+        _copy_disabled = True
+        return False
+
+    try:
+        with conn.transaction(), conn.cursor() as cur:
+            cur.execute(create_stmt)
+            with cur.copy(copy_stmt) as copy:
+                for row in rows:
+                    copy.write_row((row["deck_id"], _dumps(row["json_decklist"]).decode("utf-8")))
+            cur.execute(insert_stmt)
+        return True
+    except psycopg.Error as e:
+        close_copy_connection()
+        if isinstance(e, _COPY_PERMANENT_ERRORS):
+            logger.error("COPY of %s decks failed (%s); using PostgREST for the rest of this run", len(rows), e)
+            _copy_disabled = True
+        else:
+            logger.error("COPY of %s decks failed: %s", len(rows), e)
+        return False
+
+
+def _save_rows_bulk(rows: List[Dict]) -> bool:
+    """Bulk save via COPY when a DB URL is configured, else (or on failure) via PostgREST."""
+    if SUPABASE_DB_URL and psycopg is not None and not _copy_disabled:
+        if save_decks_copy(rows):
+            return True
+        logger.warning("Falling back to PostgREST for %s decks", len(rows))
+    return save_decks_bulk(rows)
+
+
+def _flush_pending(pending: List[Dict], stats: Dict[str, int]):
+    """
+    Save buffered rows in one bulk request and update stats.
+    If the bulk request fails, retry row by row so one bad deck does not
+    sink the whole buffer.
+    """
+    if not pending:
+        return
+
+    saved_ids: List[int] = []
+    if _save_rows_bulk(pending):
+        logger.info("Successfully saved %s decks", len(pending))
+        saved_ids = [row["deck_id"] for row in pending]
+    else:
+        logger.warning("Bulk save failed; retrying %s decks one by one", len(pending))
+        for row in pending:
+            if save_deck_to_supabase(row["deck_id"], row["json_decklist"]):
+                logger.info("Successfully saved deck %s", row["deck_id"])
+                saved_ids.append(row["deck_id"])
+
+    stats["success"] += len(saved_ids)
+    stats["failed"] += len(pending) - len(saved_ids)
+    mark_saved_ids(saved_ids)
+    pending.clear()
+
+
 # ----------------------------------------------------
 # Import decks in batches
 # ----------------------------------------------------
-def import_decks_batch(deck_ids: List[int]) -> Dict[str, int]:
-    """Import a batch of deck IDs and return statistics."""
-    stats = {"success": 0, "failed": 0, "skipped": 0}
-
-    for i, deck_id in enumerate(deck_ids, 1):
-        log(f"[{i}/{len(deck_ids)}] Processing deck {deck_id}...")
+def _fetch_and_convert(deck_id: int, position: int, total: int) -> Union[Dict, object, None]:
+    """
+    Fetch and convert one deck. Returns a row ready to save, DECK_NOT_FOUND
+    for a deck MTGGoldfish no longer has, or None on failure.
+    """
+    logger.info("[%s/%s] Processing deck %s...", position, total, deck_id)
 
+    try:
         text = fetch_deck_text(deck_id)
-        if not text:
-            log(f"Could not fetch deck {deck_id} (likely throttled or missing)", "WARNING")
-            stats["failed"] += 1
-            continue
+    except Exception as e:
+        logger.error("Error fetching deck %s: %s", deck_id, e)
+        return None
+    if text is DECK_NOT_FOUND:
+        return DECK_NOT_FOUND
+    if not text:
+        logger.warning("Could not fetch deck %s (likely throttled)", deck_id)
+        return None
 
-        try:
-            json_decklist = process_decklist_to_json(text)
+    try:
+        return {"deck_id": int(deck_id), "json_decklist": process_decklist_to_json(text)}
+    except Exception as e:
+        logger.error("Error processing deck %s: %s", deck_id, e)
+        return None
 
-            if save_deck_to_supabase(deck_id, json_decklist):
-                log(f"Successfully saved deck {deck_id}")
-                stats["success"] += 1
-            else:
-                stats["failed"] += 1
 
-        except Exception as e:
-            log(f"Error processing deck {deck_id}: {e}", "ERROR")
-            stats["failed"] += 1
+def import_decks_batch(deck_ids: List[int], skip_ids: Optional[Set[int]] = None) -> Dict[str, int]:
+    """
+    Import a batch of deck IDs and return statistics.
+    IDs in `skip_ids` (already cached or already attempted this run) are
+    counted as skipped without any HTTP call; decks MTGGoldfish reports as
+    not found are counted as dead, not failed. The rest are fetched
+    concurrently and saved in bulk every SUPABASE_INSERT_BATCH rows or
+    SUPABASE_FLUSH_INTERVAL seconds, whichever comes first.
+    """
+    stats = {"success": 0, "failed": 0, "skipped": 0, "dead": 0}
+    if skip_ids:
+        todo = [deck_id for deck_id in deck_ids if deck_id not in skip_ids]
+        stats["skipped"] = len(deck_ids) - len(todo)
+        deck_ids = todo
+    total = len(deck_ids)
+    pending: List[Dict] = []
 
-        # Optional extra delay (generally keep this low; MTGGoldfish jitter does the heavy lifting)
-        if RATE_LIMIT_DELAY > 0:
-            time.sleep(RATE_LIMIT_DELAY)
+    first_pending_at = 0.0
 
+    # Whatever happens to the rest of the batch, rows already fetched are saved
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, DECK_CONCURRENCY)) as pool:
+            not_done = {
+                pool.submit(_fetch_and_convert, deck_id, i, total)
+                for i, deck_id in enumerate(deck_ids, 1)
+            }
+            while not_done:
+                timeout = None
+                if pending:
+                    timeout = max(0.0, first_pending_at + SUPABASE_FLUSH_INTERVAL - time.monotonic())
+                done, not_done = wait(not_done, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    row = future.result()
+                    if row is None:
+                        stats["failed"] += 1
+                        continue
+                    if row is DECK_NOT_FOUND:
+                        stats["dead"] += 1
+                        continue
+
+                    if not pending:
+                        first_pending_at = time.monotonic()
+                    pending.append(row)
+                    if len(pending) >= SUPABASE_INSERT_BATCH:
+                        _flush_pending(pending, stats)
+
+                if pending and time.monotonic() - first_pending_at >= SUPABASE_FLUSH_INTERVAL:
+                    _flush_pending(pending, stats)
+    finally:
+        _flush_pending(pending, stats)
     return stats
 
 
@@ -389,88 +1311,141 @@ def import_decks_batch(deck_ids: List[int]) -> Dict[str, int]:
 def sync_missing_decks() -> int:
     """
     Sync missing decks from results table to cache table.
-    Processes ALL missing decks by looping until none remain.
+    Processes ALL missing decks by looping until none remain: each RPC call
+    returns a slice of missing IDs that is imported in local batches.
     """
     try:
-        log("=" * 60)
-        log("DECK SYNC STARTING (JSON MODE)")
-        log("=" * 60)
+        logger.info("=" * 60)
+        logger.info("DECK SYNC STARTING (JSON MODE)")
+        logger.info("=" * 60)
 
-        total_stats = {"success": 0, "failed": 0, "skipped": 0}
+        if SUPABASE_DB_URL and psycopg is None:
+            logger.warning("SUPABASE_DB_URL is set but psycopg is not installed; using PostgREST for inserts")
+
+        total_stats = {"success": 0, "failed": 0, "skipped": 0, "dead": 0}
         batch_num = 0
 
         # NEW: track if there was any work to do
         saw_missing_any = False
 
-        while True:
-            batch_num += 1
+        # IDs attempted earlier in this run, saved by a recent run or known
+        # to 404 (plus, optionally, everything already in the cache table)
+        handled_ids: Set[int] = get_recently_saved_ids() | get_dead_ids()
+        if PRELOAD_CACHED_IDS:
+            handled_ids |= get_cached_deck_ids()
 
-            limit = MAX_DECKS_PER_RUN if MAX_DECKS_PER_RUN > 0 else BATCH_FETCH_LIMIT
-            missing_ids = get_missing_ids(limit=limit)
+        fetch_limit = MAX_DECKS_PER_RUN if MAX_DECKS_PER_RUN > 0 else MISSING_IDS_FETCH_LIMIT
+        # IDs the RPC returned earlier in this run (each is processed once)
+        seen_ids: Set[int] = set()
+        # Leading missing IDs that are all skipped locally; paged past
+        offset = 0
+        paged_past = False
+        stop = False
+        blocked = False
 
-            log("=" * 60)
-            log(f"BATCH {batch_num} ANALYSIS")
-            log("=" * 60)
-            log(f"Missing in cache (this batch): {len(missing_ids)}")
+        while not stop:
+            missing_ids = get_missing_ids(limit=fetch_limit, offset=offset)
 
             if not missing_ids:
-                log("No missing decks to import. Cache is up to date!")
+                logger.info("No missing decks to import. Cache is up to date!")
                 break
 
             # NEW: we found work to do
             saw_missing_any = True
+            new_ids = [deck_id for deck_id in missing_ids if deck_id not in seen_ids]
+            seen_ids.update(missing_ids)
+            slice_fetched = 0
+
+            for start in range(0, len(new_ids), BATCH_FETCH_LIMIT):
+                batch_ids = new_ids[start:start + BATCH_FETCH_LIMIT]
+                batch_num += 1
+
+                logger.info("=" * 60)
+                logger.info("BATCH %s ANALYSIS", batch_num)
+                logger.info("=" * 60)
+                logger.info("Missing in cache (this batch): %s", len(batch_ids))
+
+                logger.info("=" * 60)
+                logger.info("PROCESSING %s DECKS (BATCH %s)", len(batch_ids), batch_num)
+                logger.info("=" * 60)
+
+                stats = import_decks_batch(batch_ids, skip_ids=handled_ids)
+                handled_ids.update(batch_ids)
+                slice_fetched += len(batch_ids) - stats["skipped"]
+
+                total_stats["success"] += stats["success"]
+                total_stats["failed"] += stats["failed"]
+                total_stats["skipped"] += stats["skipped"]
+                total_stats["dead"] += stats["dead"]
+
+                logger.info("=" * 60)
+                logger.info("BATCH %s SUMMARY", batch_num)
+                logger.info("=" * 60)
+                logger.info("Imported: %s", stats["success"])
+                logger.info("Failed: %s", stats["failed"])
+                logger.info("Skipped: %s", stats["skipped"])
+                logger.info("Not found: %s", stats["dead"])
+
+                # If we failed all of them, continuing could loop forever (same IDs keep returning)
+                if stats["success"] == 0 and stats["failed"] > 0 and MAX_DECKS_PER_RUN == 0:
+                    logger.warning(
+                        "No successes in this batch while processing ALL decks; stopping to avoid infinite loop. "
+                        "This is usually MTGGoldfish throttling on GitHub Actions. "
+                        "Increase MTGGOLDFISH_DELAY_MIN/MAX or rerun later."
+                    )
+                    stop = True
+                    break
+
+            if stop or slice_fetched:
+                paged_past = False
+                continue
 
-            log("=" * 60)
-            log(f"PROCESSING {len(missing_ids)} DECKS (BATCH {batch_num})")
-            log("=" * 60)
-
-            stats = import_decks_batch(missing_ids)
-
-            total_stats["success"] += stats["success"]
-            total_stats["failed"] += stats["failed"]
-            total_stats["skipped"] += stats["skipped"]
-
-            log("=" * 60)
-            log(f"BATCH {batch_num} SUMMARY")
-            log("=" * 60)
-            log(f"Imported: {stats['success']}")
-            log(f"Failed: {stats['failed']}")
-            log(f"Skipped: {stats['skipped']}")
-
-            # If we failed all of them, continuing could loop forever (same IDs keep returning)
-            if stats["success"] == 0 and stats["failed"] > 0 and MAX_DECKS_PER_RUN == 0:
-                log(
-                    "No successes in this batch while processing ALL decks; stopping to avoid infinite loop. "
-                    "This is usually MTGGoldfish throttling on GitHub Actions. "
-                    "Increase MTGGOLDFISH_DELAY_MIN/MAX or rerun later.",
-                    "WARNING",
+            # Nothing to fetch in this slice: the RPC only returned IDs that
+            # were handled this run or are skipped locally (recently saved,
+            # dead). The RPC keeps returning those, so a full window of them
+            # would hide the real missing decks behind it: page past them.
+            if len(missing_ids) < fetch_limit:
+                logger.info("All missing IDs returned were already handled; stopping.")
+                break
+            if paged_past and not new_ids:
+                # Same IDs again after moving the offset: the RPC ignores ?offset=
+                logger.warning(
+                    "All %s missing IDs the RPC returns are skipped locally (dead or recently saved) "
+                    "and the RPC cannot be paged past them, so decks behind them were not reached; stopping.",
+                    len(missing_ids),
                 )
+                blocked = True
                 break
-
-            # Be polite between batches (small pause)
-            time.sleep(random.uniform(2.0, 5.0))
-
-        log("=" * 60)
-        log("FINAL SUMMARY (ALL BATCHES)")
-        log("=" * 60)
-        log(f"Successfully imported: {total_stats['success']}")
-        log(f"Failed to import: {total_stats['failed']}")
-        log(f"Skipped: {total_stats['skipped']}")
-        log("=" * 60)
+            offset += len(missing_ids)
+            paged_past = True
+            logger.info("Missing-ID window is full of skipped IDs; continuing from offset %s", offset)
+
+        logger.info("=" * 60)
+        logger.info("FINAL SUMMARY (ALL BATCHES)")
+        logger.info("=" * 60)
+        logger.info("Successfully imported: %s", total_stats["success"])
+        logger.info("Failed to import: %s", total_stats["failed"])
+        logger.info("Skipped: %s", total_stats["skipped"])
+        logger.info("Not found on MTGGoldfish: %s", total_stats["dead"])
+        logger.info("=" * 60)
 
         # ✅ FIXED EXIT CODES:
         # - If there was nothing to do => success
         # - If there was work and at least one success => success
-        # - If there was work but zero successes => failure
+        # - If there was work but zero successes (and not everything skipped) => failure
+        # - If locally skipped IDs hid the rest of the missing decks => failure
+        if blocked:
+            return 1
         if not saw_missing_any:
             return 0
-        return 0 if total_stats["success"] > 0 else 1
+        return 0 if total_stats["success"] > 0 or total_stats["failed"] == 0 else 1
 
     except Exception as e:
-        log(f"Fatal error: {e}", "ERROR")
-        import traceback
-        log(traceback.format_exc(), "ERROR")
+        logger.error("Fatal error: %s: %s", type(e).__name__, e, exc_info=DEBUG)
         return 1
+    finally:
+        if psycopg is not None:
+            close_copy_connection()
 
 
 # -------------------------------